@@ -1,7 +1,18 @@
 import streamlit as st
+import functools
 import math
+import numpy as np
 import pandas as pd
-from datetime import datetime, time
+try:
+    from sklearn.neighbors import BallTree
+except ImportError:
+    BallTree = None
+try:
+    import numba
+except ImportError:
+    numba = None
+import time
+from collections import deque
 
 # Distance calculation using Haversine formula
 def calculate_distance(lat1, lon1, lat2, lon2):
@@ -19,69 +30,309 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     dlon = lon2_rad - lon1_rad
     
     # Haversine formula
-    a = (math.sin(dlat / 2) ** 2 + 
+    a = (math.sin(dlat / 2) ** 2 +
          math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
+    # Equivalent to 2*atan2(sqrt(a), sqrt(1-a)) but with one sqrt and a
+    # cheaper intrinsic; min() guards against fp drift past 1.0
+    c = 2 * math.asin(math.sqrt(min(1.0, a)))
+
     return R * c
 
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _haversine_many(lat0, lon0, cos_lat0, lats, lons, cos_lats):
+        """JIT haversine from (lat0, lon0) to arrays of radians"""
+        out = np.empty(lats.shape[0], dtype=np.float64)
+        for i in numba.prange(lats.shape[0]):
+            dlat = lats[i] - lat0
+            dlon = lons[i] - lon0
+            a = (math.sin(dlat / 2) ** 2 +
+                 cos_lat0 * cos_lats[i] * math.sin(dlon / 2) ** 2)
+            # Same fp-drift clamp as calculate_distance
+            out[i] = 2 * 6371.0 * math.asin(math.sqrt(min(1.0, a)))
+        return out
+else:
+    def _haversine_many(lat0, lon0, cos_lat0, lats, lons, cos_lats):
+        """NumPy haversine from (lat0, lon0) to arrays of radians"""
+        dlat = lats - lat0
+        dlon = lons - lon0
+        a = (np.sin(dlat / 2) ** 2 +
+             cos_lat0 * cos_lats * np.sin(dlon / 2) ** 2)
+        # Same fp-drift clamp as calculate_distance
+        return 2 * 6371.0 * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
 class HobbyCirclesApp:
+    _INITIAL_CAPACITY = 64
+
     def __init__(self):
-        self.users = []
         self.activities = []
-    
+        # Newest-first window over the last few activities so display
+        # never slices the full history
+        self._recent = deque(maxlen=5)
+        # Bumped on every write so st.cache_data entries keyed on it
+        # are invalidated whenever the data changes
+        self._version = 0
+        # Columnar user store: numeric columns live in preallocated
+        # NumPy arrays (doubled in capacity when full) so queries scan
+        # contiguous memory instead of chasing per-user dicts
+        self._n_users = 0
+        self._capacity = self._INITIAL_CAPACITY
+        self._lat = np.empty(self._capacity, dtype=np.float64)
+        self._lon = np.empty(self._capacity, dtype=np.float64)
+        self._lat_rad = np.empty(self._capacity, dtype=np.float64)
+        self._lon_rad = np.empty(self._capacity, dtype=np.float64)
+        # Each user's latitude never changes, so its cosine is computed
+        # once at insert instead of per distance query
+        self._coslat = np.empty(self._capacity, dtype=np.float64)
+        # BallTree over radian coordinates for great-circle radius
+        # queries; rebuilt lazily after inserts
+        self._tree = None
+        # Ragged / non-numeric columns stay as Python lists
+        self._usernames = []
+        # Memoized tuple handed to the sidebar selectbox every rerun;
+        # invalidated by add_user
+        self._usernames_cache = None
+        self._bios = []
+        self._interests = []
+        self._interest_masks = []
+        self._join_dates = []
+        # Interest vocabulary: each unique interest gets a bit index so
+        # shared-interest tests become a single integer AND
+        self._interest_id = {}
+        self._id_interest = []
+        # Inverted index: interest id -> indices of users who have it,
+        # so specific-interest queries skip everyone else entirely
+        self._by_interest = {}
+        # Username -> column index for O(1) lookups
+        self._by_name = {}
+        # Per-instance LRU over user-pair distances for features that
+        # ask about the same pairs repeatedly (meetup suggestions,
+        # chat intros); cleared whenever the store changes
+        self._pair_distance = functools.lru_cache(maxsize=100_000)(
+            self._pair_distance_uncached
+        )
+        # Warm up the distance kernel so any JIT compilation happens at
+        # app construction rather than on the first query
+        _haversine_many(0.0, 0.0, 1.0, np.zeros(1), np.zeros(1), np.ones(1))
+
+    def _grow(self):
+        """Double the capacity of the numeric columns"""
+        n = self._n_users
+        self._capacity *= 2
+        for name in ('_lat', '_lon', '_lat_rad', '_lon_rad', '_coslat'):
+            old = getattr(self, name)
+            new = np.empty(self._capacity, dtype=np.float64)
+            new[:n] = old[:n]
+            setattr(self, name, new)
+
+    @property
+    def usernames(self):
+        """All usernames as a tuple, rebuilt only after inserts"""
+        if self._usernames_cache is None:
+            self._usernames_cache = tuple(self._usernames)
+        return self._usernames_cache
+
+    def _intern_interest(self, interest):
+        """Map an interest name to its small-int id, growing the
+        vocabulary on first sight"""
+        interest_id = self._interest_id.get(interest)
+        if interest_id is None:
+            interest_id = len(self._id_interest)
+            self._interest_id[interest] = interest_id
+            self._id_interest.append(interest)
+        return interest_id
+
     def add_user(self, username, lat, lon, interests, bio=""):
         """Add new user to the system"""
-        user = {
-            'username': username,
-            'lat': lat,
-            'lon': lon,
-            'interests': interests,
-            'bio': bio,
-            'join_date': datetime.now()
-        }
-        self.users.append(user)
+        n = self._n_users
+        if n == self._capacity:
+            self._grow()
+
+        interest_mask = 0
+        for interest in interests:
+            interest_id = self._intern_interest(interest)
+            interest_mask |= 1 << interest_id
+            self._by_interest.setdefault(interest_id, []).append(n)
+        self._by_name[username] = n
+        self._usernames.append(username)
+        self._usernames_cache = None
+        self._bios.append(bio)
+        self._interests.append(tuple(interests))
+        self._interest_masks.append(interest_mask)
+        # Epoch float; formatted only if a view ever needs to render it
+        self._join_dates.append(time.time())
+
+        lat_rad = math.radians(lat)
+        lon_rad = math.radians(lon)
+        self._lat[n] = lat
+        self._lon[n] = lon
+        self._lat_rad[n] = lat_rad
+        self._lon_rad[n] = lon_rad
+        self._coslat[n] = math.cos(lat_rad)
+        self._n_users = n + 1
+        self._tree = None  # mark the spatial index dirty
+        self._pair_distance.cache_clear()
+        self._version += 1
         return f"Welcome {username}! Your profile is ready."
-    
-    def find_matches(self, username, radius_km=5, specific_interest=None):
-        """Find compatible users within radius"""
-        current_user = next((u for u in self.users if u['username'] == username), None)
-        if not current_user:
+
+    def _pair_distance_uncached(self, i, j):
+        return calculate_distance(
+            self._lat[i], self._lon[i], self._lat[j], self._lon[j]
+        )
+
+    def pair_distance(self, i, j):
+        """Great-circle distance in km between the users at two column
+        indices, memoized per pair"""
+        # The columns are preallocated to capacity, so an out-of-range
+        # index would read uninitialized slots instead of raising
+        if not (0 <= i < self._n_users and 0 <= j < self._n_users):
+            raise IndexError(f"user index out of range: ({i}, {j})")
+        if i > j:
+            i, j = j, i  # symmetric, so normalize the cache key
+        return self._pair_distance(i, j)
+
+    def _decode_interest_mask(self, mask):
+        """Turn an interest bitmask back into the interest names"""
+        names = []
+        while mask:
+            low_bit = mask & -mask
+            names.append(self._id_interest[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return names
+
+    def _spatial_tree(self):
+        """Return the BallTree over user positions, rebuilding if stale"""
+        if self._tree is None and BallTree is not None and self._n_users:
+            n = self._n_users
+            self._tree = BallTree(
+                np.c_[self._lat_rad[:n], self._lon_rad[:n]],
+                metric='haversine'
+            )
+        return self._tree
+
+    def _candidates_within(self, self_idx, radius_km):
+        """Indices of users at most radius_km away (may overshoot)"""
+        tree = self._spatial_tree()
+        if tree is not None:
+            # The haversine metric works in radians on the unit sphere,
+            # so the radius converts by dividing by Earth's radius
+            q = [[self._lat_rad[self_idx], self._lon_rad[self_idx]]]
+            found = tree.query_radius(q, r=radius_km / 6371.0)[0]
+            return found.astype(np.intp, copy=False)
+        # No scikit-learn: bounding-box prefilter in degrees. abs+compare is
+        # far cheaper than the trig in haversine, so pruning the users
+        # outside the box first keeps the exact pass small
+        n = self._n_users
+        lat0_deg = self._lat[self_idx]
+        lon0_deg = self._lon[self_idx]
+        dlat_max = radius_km / 111.32
+        dlon_max = radius_km / (111.32 * self._coslat[self_idx])
+        in_box = ((np.abs(self._lat[:n] - lat0_deg) < dlat_max) &
+                  (np.abs(self._lon[:n] - lon0_deg) < dlon_max))
+        return np.flatnonzero(in_box)
+
+    def _user_dict(self, idx):
+        """Materialize a dict view of the user at a column index"""
+        return {
+            'username': self._usernames[idx],
+            'lat': float(self._lat[idx]),
+            'lon': float(self._lon[idx]),
+            'interests': self._interests[idx],
+            'interest_mask': self._interest_masks[idx],
+            'bio': self._bios[idx],
+            'join_date': self._join_dates[idx]
+        }
+
+    def get_user(self, username):
+        """Look up a user record by username, or None if unknown"""
+        idx = self._by_name.get(username)
+        return None if idx is None else self._user_dict(idx)
+
+    def find_matches(self, username, radius_km=5, specific_interest=None, limit=50):
+        """Find compatible users within radius, closest first"""
+        self_idx = self._by_name.get(username)
+        if self_idx is None:
             return []
-        
-        matches = []
-        for user in self.users:
-            if user['username'] == username:
-                continue
-            
-            # Calculate distance
-            distance = calculate_distance(
-                current_user['lat'], current_user['lon'],
-                user['lat'], user['lon']
+
+        cur_mask = self._interest_masks[self_idx]
+        specific_bit = 0
+        if specific_interest:
+            interest_id = self._interest_id.get(specific_interest)
+            if interest_id is None:
+                return []  # nobody has this interest yet
+            specific_bit = 1 << interest_id
+
+        lat0 = float(self._lat_rad[self_idx])
+        lon0 = float(self._lon_rad[self_idx])
+
+        # Prune the search space before any trig work. A specific
+        # interest restricts candidates to the users who actually have
+        # it, typically a far smaller set than the radius does
+        if specific_bit:
+            candidates = np.asarray(
+                self._by_interest[interest_id], dtype=np.intp
             )
-            
-            # Check if within radius
-            if distance > radius_km:
+        else:
+            candidates = self._candidates_within(self_idx, radius_km)
+        if not len(candidates):
+            return []
+
+        # Exact haversine over the candidates
+        distances = _haversine_many(
+            lat0, lon0, float(self._coslat[self_idx]),
+            np.ascontiguousarray(self._lat_rad[candidates]),
+            np.ascontiguousarray(self._lon_rad[candidates]),
+            np.ascontiguousarray(self._coslat[candidates])
+        )
+
+        # First pass: collect accepted indices without building dicts
+        kept_idx = []
+        kept_dist = []
+        kept_shared = []
+        for k in np.flatnonzero(distances <= radius_km):
+            i = int(candidates[k])
+            if i == self_idx:
                 continue
-            
-            # Find shared interests
-            shared_interests = set(current_user['interests']).intersection(set(user['interests']))
-            
+
+            # Shared interests via a single integer AND on the bitmasks
+            shared = cur_mask & self._interest_masks[i]
+            if not shared:
+                continue
+
             # Filter by specific interest if provided
-            if specific_interest and specific_interest not in shared_interests:
+            if specific_bit and not shared & specific_bit:
                 continue
-            
-            if shared_interests:
-                matches.append({
-                    'username': user['username'],
-                    'distance': round(distance, 2),
-                    'shared_interests': list(shared_interests),
-                    'bio': user.get('bio', ''),
-                    'all_interests': user['interests']
-                })
-        
-        # Sort by distance (closest first)
-        matches.sort(key=lambda x: x['distance'])
+
+            kept_idx.append(i)
+            kept_dist.append(distances[k])
+            kept_shared.append(shared)
+
+        if not kept_idx:
+            return []
+
+        # Only the closest `limit` matches are shown, so select them in
+        # O(N) with argpartition and sort just that slice
+        dists = np.asarray(kept_dist)
+        if len(dists) > limit:
+            top = np.argpartition(dists, limit)[:limit]
+            top = top[np.argsort(dists[top])]
+        else:
+            top = np.argsort(dists)
+
+        # Round the whole selected slice in one vector call rather than
+        # going through round() per match
+        top_dists = np.round(dists[top], 2)
+
+        matches = []
+        for t, dist in zip(top, top_dists):
+            i = kept_idx[t]
+            matches.append({
+                'username': self._usernames[i],
+                'distance': float(dist),
+                'shared_interests': self._decode_interest_mask(kept_shared[t]),
+                'bio': self._bios[i],
+                'all_interests': self._interests[i]
+            })
         return matches
     
     def post_activity(self, username, activity_type, description, time_slot, location=""):
@@ -93,28 +344,48 @@ class HobbyCirclesApp:
             'description': description,
             'time_slot': time_slot,
             'location': location,
-            'posted_at': datetime.now(),
+            'posted_at': time.time(),
             'responses': []
         }
         self.activities.append(activity)
+        self._recent.appendleft(activity)
+        self._version += 1
         return activity['id']
 
-# Initialize the app
-if 'app' not in st.session_state:
-    st.session_state.app = HobbyCirclesApp()
-    
-    # Add sample users for Hyderabad
-    sample_users = [
-        ("HyderabadBuddy", 17.385044, 78.486671, ["Badminton", "Food", "Board Games"], "Love exploring new places!"),
-        ("SportyPal", 17.390000, 78.480000, ["Badminton", "Football", "Cycling"], "Always up for sports!"),
-        ("FoodieFriend", 17.380000, 78.490000, ["Food", "Movies", "Photography"], "Foodie and movie buff"),
-        ("BookLover", 17.370000, 78.480000, ["Board Games", "Reading", "Coffee"], "Coffee and books person"),
-        ("TechieGeek", 17.375000, 78.485000, ["Board Games", "Gaming", "Food"], "Tech enthusiast"),
-        ("OutdoorExplorer", 17.395000, 78.475000, ["Cycling", "Hiking", "Photography"], "Adventure seeker")
-    ]
-    
-    for username, lat, lon, interests, bio in sample_users:
-        st.session_state.app.add_user(username, lat, lon, interests, bio)
+# Cached views over the app state. Streamlit reruns the whole script on
+# every widget interaction; the version argument keys each cache entry to
+# the app's write counter so results are reused until the data changes.
+@st.cache_data(ttl=60)
+def _cached_matches(version, username, radius_km, specific_interest):
+    return get_app().find_matches(
+        username, radius_km=radius_km, specific_interest=specific_interest
+    )
+
+@st.cache_data
+def _cached_user(version, username):
+    return get_app().get_user(username)
+
+# Sample users for Hyderabad
+SAMPLE_USERS = [
+    ("HyderabadBuddy", 17.385044, 78.486671, ["Badminton", "Food", "Board Games"], "Love exploring new places!"),
+    ("SportyPal", 17.390000, 78.480000, ["Badminton", "Football", "Cycling"], "Always up for sports!"),
+    ("FoodieFriend", 17.380000, 78.490000, ["Food", "Movies", "Photography"], "Foodie and movie buff"),
+    ("BookLover", 17.370000, 78.480000, ["Board Games", "Reading", "Coffee"], "Coffee and books person"),
+    ("TechieGeek", 17.375000, 78.485000, ["Board Games", "Gaming", "Food"], "Tech enthusiast"),
+    ("OutdoorExplorer", 17.395000, 78.475000, ["Cycling", "Hiking", "Photography"], "Adventure seeker")
+]
+
+# One shared app instance for the whole server: cache_resource builds
+# it — sample data, spatial index and vocab — once across all sessions
+# instead of once per st.session_state
+@st.cache_resource
+def get_app():
+    app = HobbyCirclesApp()
+    for username, lat, lon, interests, bio in SAMPLE_USERS:
+        app.add_user(username, lat, lon, interests, bio)
+    return app
+
+app = get_app()
 
 # Streamlit App Interface
 st.set_page_config(page_title="Hobby Circles", page_icon="🎯", layout="wide")
@@ -129,24 +400,30 @@ with st.sidebar:
     # User selection
     username = st.selectbox(
         "Choose your username:",
-        [u['username'] for u in st.session_state.app.users],
+        app.usernames,
         help="Select your profile to find matches"
     )
     
     st.header("🔍 Search Preferences")
-    
-    # Search radius
-    radius = st.slider("Search radius (km):", 1, 15, 5)
-    
-    # Interest filter
-    if username:
-        current_user = next(u for u in st.session_state.app.users if u['username'] == username)
-        interest_filter = st.selectbox(
-            "Focus on specific interest:",
-            ["All interests"] + current_user['interests']
-        )
-        if interest_filter == "All interests":
-            interest_filter = None
+
+    # Batch the search widgets in a form so tweaking the radius or the
+    # interest filter doesn't rerun the script until submit
+    with st.form("search_form"):
+        # Search radius
+        radius = st.slider("Search radius (km):", 1, 15, 5)
+
+        # Interest filter
+        interest_filter = None
+        if username:
+            current_user = _cached_user(app._version, username)
+            interest_filter = st.selectbox(
+                "Focus on specific interest:",
+                ("All interests",) + current_user['interests']
+            )
+            if interest_filter == "All interests":
+                interest_filter = None
+
+        search_submitted = st.form_submit_button("🔍 Find Matches!", type="primary")
 
 # Main content area
 col1, col2 = st.columns([2, 1])
@@ -154,12 +431,13 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.header("🚀 Find Your Hobby Buddies")
     
-    if st.button("🔍 Find Matches!", type="primary"):
+    if search_submitted:
         if username:
-            matches = st.session_state.app.find_matches(
-                username, 
-                radius_km=radius,
-                specific_interest=interest_filter
+            matches = _cached_matches(
+                app._version,
+                username,
+                radius,
+                interest_filter
             )
             
             if matches:
@@ -187,7 +465,7 @@ with col1:
 with col2:
     st.header("📊 Your Profile")
     if username:
-        current_user = next(u for u in st.session_state.app.users if u['username'] == username)
+        current_user = _cached_user(app._version, username)
         st.write(f"**Username:** {current_user['username']}")
         st.write(f"**Bio:** {current_user['bio']}")
         st.write(f"**Interests:** {', '.join(current_user['interests'])}")
@@ -200,50 +478,67 @@ with col2:
         })
         st.map(user_location, zoom=12)
 
-# Activity posting section
-st.header("🎪 Post a New Activity")
-with st.expander("Create Activity Request", expanded=False):
-    activity_col1, activity_col2 = st.columns(2)
-    
-    with activity_col1:
-        activity_type = st.selectbox(
-            "Activity Type:",
-            ["Badminton", "Food Exploration", "Board Games", "Movies", "Cycling", "Photography", "Other"]
-        )
-        
-        activity_desc = st.text_input(
-            "Description:",
-            placeholder="e.g., Looking for badminton partner at LB Stadium"
-        )
-    
-    with activity_col2:
-        activity_time = st.selectbox(
-            "When:",
-            ["Right now", "This evening", "Tomorrow", "This weekend", "Next week"]
-        )
-        
-        activity_location = st.text_input(
-            "Location (optional):",
-            placeholder="e.g., LB Stadium, Banjara Hills"
-        )
-    
-    if st.button("🚀 Post Activity"):
-        if username and activity_desc:
-            activity_id = st.session_state.app.post_activity(
-                username, activity_type, activity_desc, activity_time, activity_location
+# Activity posting section. As a fragment, interacting with these
+# widgets reruns only this block, not the match search or the map.
+@st.fragment
+def activity_section(username):
+    st.header("🎪 Post a New Activity")
+    # Confirmation for a post from the previous run: the full rerun
+    # below would discard anything rendered before it, so the posted ID
+    # is carried across the rerun in session state
+    if 'posted_activity_id' in st.session_state:
+        st.success(f"Activity posted! ID: {st.session_state.pop('posted_activity_id')}")
+    with st.expander("Create Activity Request", expanded=False):
+        activity_col1, activity_col2 = st.columns(2)
+
+        with activity_col1:
+            activity_type = st.selectbox(
+                "Activity Type:",
+                ["Badminton", "Food Exploration", "Board Games", "Movies", "Cycling", "Photography", "Other"]
+            )
+
+            activity_desc = st.text_input(
+                "Description:",
+                placeholder="e.g., Looking for badminton partner at LB Stadium"
             )
-            st.success(f"Activity posted! ID: {activity_id}")
-        else:
-            st.error("Please fill in the activity description!")
+
+        with activity_col2:
+            activity_time = st.selectbox(
+                "When:",
+                ["Right now", "This evening", "Tomorrow", "This weekend", "Next week"]
+            )
+
+            activity_location = st.text_input(
+                "Location (optional):",
+                placeholder="e.g., LB Stadium, Banjara Hills"
+            )
+
+        if st.button("🚀 Post Activity"):
+            if username and activity_desc:
+                activity_id = app.post_activity(
+                    username, activity_type, activity_desc, activity_time, activity_location
+                )
+                st.session_state.posted_activity_id = activity_id
+                # Posts are rare, so escalate to a full rerun here: the
+                # Recent Activities fragment below would otherwise keep
+                # showing the stale list until an unrelated interaction
+                st.rerun(scope="app")
+            else:
+                st.error("Please fill in the activity description!")
 
 # Show recent activities
-st.header("🎯 Recent Activities")
-if st.session_state.app.activities:
-    for activity in st.session_state.app.activities[-5:]:  # Show last 5 activities
-        with st.container():
-            st.write(f"**{activity['username']}** wants to do **{activity['activity_type']}**")
-            st.write(f"📝 {activity['description']}")
-            st.write(f"⏰ {activity['time_slot']} | 📍 {activity['location'] or 'Location TBD'}")
-            st.write("---")
-else:
-    st.info("No activities posted yet. Be the first to create one!")
+@st.fragment
+def recent_activities_section():
+    st.header("🎯 Recent Activities")
+    if app._recent:
+        for activity in app._recent:  # Newest first
+            with st.container():
+                st.write(f"**{activity['username']}** wants to do **{activity['activity_type']}**")
+                st.write(f"📝 {activity['description']}")
+                st.write(f"⏰ {activity['time_slot']} | 📍 {activity['location'] or 'Location TBD'}")
+                st.write("---")
+    else:
+        st.info("No activities posted yet. Be the first to create one!")
+
+activity_section(username)
+recent_activities_section()